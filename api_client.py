@@ -1,7 +1,64 @@
 import json
+import asyncio
 import pandas as pd
+import google.generativeai as genai
+from datetime import timedelta
+from google.api_core.exceptions import ResourceExhausted
+from google.generativeai import caching
 from jobspy import scrape_jobs
-from config import gemini_model # Import the initialized Gemini client
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
+from config import gemini_model, GEMINI_MODEL_NAME # Import the initialized Gemini client
+
+# Job descriptions are cut to this many characters in analysis prompts. The requirements that
+# matter for a rating come early in a posting, and the rest is mostly input-token cost.
+GEMINI_MAX_DESCRIPTION_CHARS = 8000
+
+# --- RESPONSE SCHEMAS ---
+# Gemini's JSON mode with a schema guarantees parseable output in exactly these shapes,
+# so responses never need markdown fences stripped before json.loads.
+ANALYSIS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'results': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'idx': {'type': 'integer'},
+                    'gemini_rating': {'type': 'integer'},
+                    'ai_reason': {'type': 'string'}
+                },
+                'required': ['idx', 'gemini_rating', 'ai_reason']
+            }
+        }
+    },
+    'required': ['results']
+}
+SUGGESTIONS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'suggestions': {'type': 'array', 'items': {'type': 'string'}}
+    },
+    'required': ['suggestions']
+}
+ANALYSIS_RESPONSE_CONFIG = genai.GenerationConfig(response_mime_type="application/json", response_schema=ANALYSIS_SCHEMA)
+SUGGESTIONS_RESPONSE_CONFIG = genai.GenerationConfig(response_mime_type="application/json", response_schema=SUGGESTIONS_SCHEMA)
+
+@retry(
+    retry=retry_if_exception_type(ResourceExhausted),
+    wait=wait_exponential(multiplier=1, min=2, max=30),
+    stop=stop_after_attempt(5),
+    reraise=True
+)
+async def _generate_json_async(model: genai.GenerativeModel, prompt: str, response_config: genai.GenerationConfig):
+    """
+    Sends a JSON-mode request to Gemini, backing off and retrying when rate limited (HTTP 429).
+    The blocking client runs in a worker thread rather than using generate_content_async: the SDK
+    keeps one gRPC async client per process, bound to the event loop of the first asyncio.run(),
+    so every later run in the same process (each search in the server's worker) would fail with
+    "Event loop is closed".
+    """
+    return await asyncio.to_thread(model.generate_content, prompt, generation_config=response_config)
 
 def run_job_scrape(search_config: dict) -> list:
     """Uses JobSpy to scrape jobs based on a single search configuration."""
@@ -28,6 +85,8 @@ def run_job_scrape(search_config: dict) -> list:
             print(f"  - No new jobs found matching criteria.")
             return []
         
+        # Replace NaN with None across the whole frame in one vectorized pass, for DB/JSON compatibility.
+        jobs_df = jobs_df.astype(object).where(jobs_df.notna(), None)
         jobs_list = jobs_df.to_dict('records')
         print(f"  - Found {len(jobs_list)} potential new jobs.")
         return jobs_list
@@ -39,54 +98,61 @@ def run_job_scrape(search_config: dict) -> list:
         return []
 
 
-def get_gemini_analysis(resume_context: str, job_description: str, experience_level: str) -> dict | None:
-    """
-    Gets a qualitative analysis and rating from the Gemini API with a much stricter prompt
-    that now includes experience level filtering.
-    """
-    print("  > Getting strict qualitative analysis from Gemini...")
-    
-    # --- FINAL, UPGRADED PROMPT ---
-    prompt = f"""
-    Act as an extremely strict, expert technical recruiter. Your only goal is to protect my time by filtering out irrelevant job postings.
+# --- STRICT RECRUITER INSTRUCTIONS ---
+# Everything here is identical for every job, so together with the resume it can be stored
+# once per run as a Gemini context cache (see create_resume_cache) instead of being re-sent
+# with every analysis request. When no explicit cache is available, prompts still start with
+# this text followed by the resume, and only the per-job values come last, so Gemini's
+# implicit prefix cache can reuse the shared part across requests.
+# Bump whenever the analysis prompts or schema change; it is part of the key of cached verdicts
+# (see run_job_search.py), so verdicts given under an older prompt are never reused.
+ANALYSIS_PROMPT_VERSION = 1
+
+ANALYSIS_SYSTEM_INSTRUCTION = """
+Act as an extremely strict, expert technical recruiter. Your only goal is to protect my time by filtering out irrelevant job postings.
+You will be given my resume, the experience level I am looking for, and one or more numbered job descriptions.
 
+YOUR INSTRUCTIONS (Follow these exactly, for EACH job description):
+1.  **EXPERIENCE LEVEL CHECK (MOST IMPORTANT):** Analyze the job title and description for keywords related to seniority (e.g., "Senior", "Sr.", "Lead", "Principal", "Manager", "Staff"). If the job requires a higher experience level than the one I am looking for, you MUST give it a low rating and reject it.
+2.  **FIELD RELEVANCE CHECK:** Analyze if the core responsibilities are a strong match for my SOFTWARE skills. Immediately REJECT jobs that are primarily for hardware, mechanical engineering, sales, or other non-software fields.
+3.  **RATING:** Based on BOTH checks above, provide a suitability rating from 1 to 10. A rating of 7 or higher means it is a very strong match for BOTH my software skills AND my desired experience level. Be extremely critical.
+4.  **JSON OUTPUT:** Return ONLY a valid JSON object with one key: "results". The value of "results" must be an array with exactly one object per job, each with three keys: "idx" (int, the job number), "gemini_rating" (int) and "ai_reason" (a concise, one-sentence reason for your rating, explaining why it is or is not a good match for the role and experience level).
+"""
+
+# --- PROMPT TEMPLATES ---
+# Built once at import; each call only fills in the {placeholders} with str.format.
+_RESUME_SECTION = """
     MY RESUME CONTEXT:
     ---
     {resume_context}
     ---
     This resume clearly indicates my skills are in SOFTWARE development.
+    """
 
+_ANALYSIS_JOBS_PROMPT = """
     THE JOB I AM LOOKING FOR:
     ---
     I am looking for an '{experience_level}' role.
     ---
 
-    JOB DESCRIPTION TO ANALYZE:
+    JOB DESCRIPTIONS TO ANALYZE (each one is numbered and must be rated independently):
     ---
-    {job_description}
+    {numbered_jobs}
     ---
-
-    YOUR INSTRUCTIONS (Follow these exactly):
-    1.  **EXPERIENCE LEVEL CHECK (MOST IMPORTANT):** Analyze the job title and description for keywords related to seniority (e.g., "Senior", "Sr.", "Lead", "Principal", "Manager", "Staff"). If the job requires a higher experience level than '{experience_level}', you MUST give it a low rating and reject it.
-    2.  **FIELD RELEVANCE CHECK:** Analyze if the core responsibilities are a strong match for my SOFTWARE skills. Immediately REJECT jobs that are primarily for hardware, mechanical engineering, sales, or other non-software fields.
-    3.  **RATING:** Based on BOTH checks above, provide a suitability rating from 1 to 10. A rating of 7 or higher means it is a very strong match for BOTH my software skills AND my desired '{experience_level}'. Be extremely critical.
-    4.  **JSON OUTPUT:** Return ONLY a valid JSON object with two keys: "gemini_rating" (int) and "ai_reason" (a concise, one-sentence reason for your rating, explaining why it is or is not a good match for the role and experience level).
     """
-    try:
-        response = gemini_model.generate_content(prompt)
-        cleaned_text = response.text.strip().replace("```json", "").replace("```", "")
-        return json.loads(cleaned_text)
-    except Exception as e:
-        print(f"  > Gemini analysis error: {e}")
-        return None
 
-def get_resume_suggestions(resume_context: str, job_description: str) -> dict | None:
-    # This function remains the same
-    """Uses Gemini to generate specific resume tailoring suggestions."""
-    print("  > Getting AI resume tailoring suggestions...")
-    prompt = f"""
+# Instructions and resume come first and the job description last, so the shared prefix
+# is eligible for Gemini's implicit caching across jobs.
+_SUGGESTIONS_PROMPT = """
     Act as an expert career coach. Your task is to help me tailor my resume for a specific job.
 
+    Based on the job description given at the end, analyze my resume and provide specific, actionable suggestions for improvement.
+    Focus on highlighting relevant skills and experiences.
+
+    Please return ONLY a valid JSON object with one key: "suggestions".
+    The value of "suggestions" should be an array of strings, where each string is a specific, well-written bullet point suggestion.
+    For example: ["Rephrase 'Managed a team' to 'Led a team of 5 engineers to increase deployment frequency by 30% using Agile methodologies', to better match the leadership skills required.", "Add a bullet point highlighting your experience with 'React' and 'TypeScript' as these are key requirements for the role."]
+
     My current resume context is:
     ---
     {resume_context}
@@ -96,18 +162,69 @@ def get_resume_suggestions(resume_context: str, job_description: str) -> dict |
     ---
     {job_description}
     ---
+    """
 
-    Based on the job description, analyze my resume and provide specific, actionable suggestions for improvement.
-    Focus on highlighting relevant skills and experiences.
+def create_resume_cache(resume_context: str):
+    """
+    Stores the recruiter instructions and resume as a Gemini context cache, so each analysis
+    request only has to send the job descriptions. Returns None if the cache can't be created
+    (e.g. the content is below the model's minimum cacheable token count); callers then fall
+    back to sending the full prompt.
+    """
+    print("  > Creating Gemini context cache for resume...")
+    try:
+        cache = caching.CachedContent.create(
+            model=GEMINI_MODEL_NAME,
+            system_instruction=ANALYSIS_SYSTEM_INSTRUCTION,
+            contents=[_RESUME_SECTION.format(resume_context=resume_context)],
+            ttl=timedelta(hours=1)
+        )
+        print(f"  > Context cache ready: {cache.name}")
+        return cache
+    except Exception as e:
+        print(f"  > Context cache unavailable, sending full prompts instead: {e}")
+        return None
 
-    Please return ONLY a valid JSON object with one key: "suggestions".
-    The value of "suggestions" should be an array of strings, where each string is a specific, well-written bullet point suggestion.
-    For example: ["Rephrase 'Managed a team' to 'Led a team of 5 engineers to increase deployment frequency by 30% using Agile methodologies', to better match the leadership skills required.", "Add a bullet point highlighting your experience with 'React' and 'TypeScript' as these are key requirements for the role."]
+async def get_gemini_analysis_batch(resume_context: str, job_descriptions: list[str], experience_level: str, cache=None) -> list[dict | None]:
+    """
+    Gets a qualitative analysis and rating for several jobs from a single Gemini request,
+    using the same strict prompt and experience level filtering as the per-job analysis.
+    If a context cache from create_resume_cache is given, only the job-specific part is sent.
+    Returns one result per job description, in order; jobs the model left out map to None.
     """
+    print(f"  > Getting strict qualitative analysis from Gemini for {len(job_descriptions)} job(s)...")
+
+    numbered_jobs = "\n\n".join(
+        f"Job {idx}:\n{description[:GEMINI_MAX_DESCRIPTION_CHARS]}"
+        for idx, description in enumerate(job_descriptions, start=1)
+    )
+
+    job_prompt = _ANALYSIS_JOBS_PROMPT.format(experience_level=experience_level, numbered_jobs=numbered_jobs)
+    if cache:
+        model = genai.GenerativeModel.from_cached_content(cached_content=cache)
+        prompt = job_prompt
+    else:
+        model = gemini_model
+        prompt = ANALYSIS_SYSTEM_INSTRUCTION + _RESUME_SECTION.format(resume_context=resume_context) + job_prompt
+
+    try:
+        response = await _generate_json_async(model, prompt, ANALYSIS_RESPONSE_CONFIG)
+        usage = response.usage_metadata
+        print(f"  > Gemini prompt tokens: {usage.prompt_token_count} ({usage.cached_content_token_count} served from cache).")
+        results = json.loads(response.text).get("results", [])
+        results_by_idx = {result.get("idx"): result for result in results if isinstance(result, dict)}
+        return [results_by_idx.get(idx) for idx in range(1, len(job_descriptions) + 1)]
+    except Exception as e:
+        print(f"  > Gemini batch analysis error: {e}")
+        return [None] * len(job_descriptions)
+
+def get_resume_suggestions(resume_context: str, job_description: str) -> dict | None:
+    """Uses Gemini to generate specific resume tailoring suggestions."""
+    print("  > Getting AI resume tailoring suggestions...")
+    prompt = _SUGGESTIONS_PROMPT.format(resume_context=resume_context, job_description=job_description)
     try:
-        response = gemini_model.generate_content(prompt)
-        cleaned_text = response.text.strip().replace("```json", "").replace("```", "")
-        return json.loads(cleaned_text)
+        response = gemini_model.generate_content(prompt, generation_config=SUGGESTIONS_RESPONSE_CONFIG)
+        return json.loads(response.text)
     except Exception as e:
         print(f"  > AI suggestion generation error: {e}")
         return None
@@ -1,8 +1,11 @@
 import os
+import contextlib
+import functools
+import platform
+import threading
 import google.generativeai as genai
 from supabase import create_client, Client
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
 
 # --- LOAD ENVIRONMENT VARIABLES ---
 print("Loading environment variables...")
@@ -18,12 +21,87 @@ print("Supabase client ready.")
 # --- INITIALIZE GOOGLE GEMINI CLIENT ---
 print("Initializing Google Gemini client...")
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-gemini_model = genai.GenerativeModel('gemini-1.5-flash')
+# 2.5 models support both explicit context caching and implicit caching of repeated prompt prefixes.
+GEMINI_MODEL_NAME = 'gemini-2.5-flash'
+gemini_model = genai.GenerativeModel(GEMINI_MODEL_NAME)
 print("Gemini client ready.")
 
-# --- LOAD SENTENCE TRANSFORMER MODEL ---
-# This is a heavy model, so we only want to load it once.
-print("Loading sentence transformer model (this may take a moment)...")
-sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
-print("Sentence transformer model loaded and ready.")
+# --- LOAD SENTENCE TRANSFORMER MODEL (LAZILY) ---
+# This is a heavy model, so it is only loaded once, on first access of `config.sentence_model`.
+# Scripts that only need `supabase` or `gemini_model` never pay for it.
+# On a CUDA GPU the model runs in PyTorch with FP16 weights. Otherwise it runs on ONNX Runtime using
+# one of the int8 dynamically quantized exports that ship in the model's hub repo, which encode
+# roughly twice as fast on CPU as the default FP32 PyTorch weights.
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
 
+def _pick_onnx_file() -> str:
+    """Picks the quantized export built for this CPU's instruction set (AVX2 if it can't be detected)."""
+    if platform.machine().lower() in ('arm64', 'aarch64'):
+        return 'onnx/model_qint8_arm64.onnx'
+    try:
+        with open('/proc/cpuinfo') as cpuinfo:
+            cpu_flags = set(cpuinfo.read().split())
+    except OSError:
+        cpu_flags = set()
+    if 'avx512_vnni' in cpu_flags:
+        return 'onnx/model_qint8_avx512_vnni.onnx'
+    if 'avx512f' in cpu_flags:
+        return 'onnx/model_qint8_avx512.onnx'
+    return 'onnx/model_quint8_avx2.onnx'
+
+EMBEDDING_ONNX_FILE = _pick_onnx_file()
+
+@functools.cache
+def _embedding_device() -> str:
+    """Returns 'cuda' when PyTorch can see a GPU, else 'cpu'. Checking means importing torch, so it runs on first use."""
+    try:
+        import torch
+    except ImportError:
+        return 'cpu'
+    return 'cuda' if torch.cuda.is_available() else 'cpu'
+
+def _embedding_model_id() -> str:
+    """Identifies the exact weights in use, so cached embeddings are never mixed across variants."""
+    if _embedding_device() == 'cuda':
+        return f"{EMBEDDING_MODEL_NAME}:cuda-fp16"
+    return f"{EMBEDDING_MODEL_NAME}:{EMBEDDING_ONNX_FILE}"
+
+def embedding_inference_mode():
+    """
+    Context for encode calls. On the PyTorch (CUDA) path this is torch.inference_mode(), which also
+    skips the version-counter and view tracking that encode's own no_grad() leaves on. ONNX Runtime
+    has no autograd, so on CPU it's a no-op. Thread-local, so it must be entered in the encoding thread.
+    """
+    if _embedding_device() == 'cuda':
+        import torch
+        return torch.inference_mode()
+    return contextlib.nullcontext()
+
+_sentence_model = None
+_sentence_model_lock = threading.Lock()
+
+def _load_sentence_model():
+    """Loads the sentence transformer model (importing sentence_transformers only now, as it pulls in torch)."""
+    from sentence_transformers import SentenceTransformer
+    device = _embedding_device()
+    print(f"Loading sentence transformer model on {device} (this may take a moment)...")
+    if device == 'cuda':
+        model = SentenceTransformer(EMBEDDING_MODEL_NAME, device='cuda').half()
+    else:
+        model = SentenceTransformer(
+            EMBEDDING_MODEL_NAME, backend='onnx', model_kwargs={'file_name': EMBEDDING_ONNX_FILE}
+        )
+    print("Sentence transformer model loaded and ready.")
+    return model
+
+def __getattr__(name):
+    """Materializes `sentence_model` and `EMBEDDING_MODEL_ID` on first access."""
+    global _sentence_model
+    if name == 'EMBEDDING_MODEL_ID':
+        return _embedding_model_id()
+    if name == 'sentence_model':
+        with _sentence_model_lock:
+            if _sentence_model is None:
+                _sentence_model = _load_sentence_model()
+        return _sentence_model
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
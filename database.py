@@ -1,5 +1,5 @@
 from config import supabase # Import the initialized Supabase client
-from datetime import datetime
+from postgrest.types import ReturnMethod
 
 def get_all_searches():
     """
@@ -39,22 +39,47 @@ def get_active_profile():
         print(f"Error fetching profile: {e}")
         return None
 
-def save_job_to_db(job_data: dict):
-    """Saves a single processed job to the Supabase database, avoiding duplicates."""
+# Supabase returns at most 1000 rows per request by default, so larger reads are paged.
+# Projects can configure a lower max_rows, so a short page doesn't mean the end of the table.
+PAGE_SIZE = 1000
+
+def get_existing_job_urls() -> set:
+    """Fetches the URLs of all jobs already saved, so duplicates can be skipped before any processing."""
+    print("Fetching URLs of already saved jobs...")
     try:
-        job_url = job_data.get('job_url')
-        if not job_url:
-            print("  > Skipped save. Job has no URL.")
-            return
+        urls = set()
+        start = 0
+        while True:
+            response = supabase.table('jobs').select('job_url').order('id').range(start, start + PAGE_SIZE - 1).execute()
+            if not response.data:
+                break
+            urls.update(row['job_url'] for row in response.data if row.get('job_url'))
+            # Advance by the rows actually returned, in case the server capped the page below PAGE_SIZE.
+            start += len(response.data)
+        print(f"Found {len(urls)} saved jobs.")
+        return urls
+    except Exception as e:
+        print(f"Error fetching saved job URLs: {e}")
+        return set()
 
-        # Check if a job with the same URL already exists
-        result = supabase.table('jobs').select('id').eq('job_url', job_url).execute()
-        if result.data:
-            print(f"  > Skipped save. Job '{job_data['title']}' already exists.")
-            return
+def save_jobs_to_db(jobs: list[dict]):
+    """
+    Saves a batch of processed jobs to the Supabase database in a single upsert.
+    Rows whose job_url already exists are ignored, and created_at is filled in by the database.
+    The inserted rows (descriptions included) aren't sent back, since nothing reads them.
+    This relies on a one-time schema change:
+        CREATE UNIQUE INDEX IF NOT EXISTS jobs_job_url_key ON jobs (job_url);
+        ALTER TABLE jobs ALTER COLUMN created_at SET DEFAULT now();
+    """
+    jobs = [job for job in jobs if job.get('job_url')]
+    if not jobs:
+        return
 
-        print(f"  > Saving new job '{job_data['title']}' to database...")
-        supabase.table('jobs').insert(job_data).execute()
+    try:
+        print(f"  > Saving {len(jobs)} new job(s) to database...")
+        supabase.table('jobs').upsert(
+            jobs, on_conflict='job_url', ignore_duplicates=True, returning=ReturnMethod.minimal
+        ).execute()
         print("  > Save successful.")
     except Exception as e:
         print(f"  > DB save error: {e}")
@@ -1,35 +1,383 @@
-import pandas as pd
-import math
-from sentence_transformers import util
-from datetime import datetime
+import asyncio
+import re
+import hashlib
+import sqlite3
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+try:
+    import simsimd
+except ImportError: # e.g. no wheel for this platform; cosine_similarities falls back to Numba or NumPy
+    simsimd = None
 
 # Import our modularized functions and configurations
-from config import sentence_model
-from database import get_all_searches, save_job_to_db 
-from api_client import run_job_scrape, get_gemini_analysis
-
-# --- HELPER FUNCTIONS (No changes here) ---
-
-def get_similarity_score(resume_embedding, job_description: str) -> float:
-    """Calculates the cosine similarity between a resume and job description."""
-    if not isinstance(job_description, str) or pd.isna(job_description):
-        return 0.0
-    job_embedding = sentence_model.encode(job_description, convert_to_tensor=True)
-    return util.cos_sim(resume_embedding, job_embedding).item()
-
-def clean_job_data(job_dict: dict) -> dict:
-    """Replaces any NaN values in a dictionary with None for DB compatibility."""
-    cleaned = {}
-    for k, v in job_dict.items():
-        if isinstance(v, float) and math.isnan(v):
-            cleaned[k] = None
+import config # The sentence model is loaded lazily, on first use of config.sentence_model
+from config import GEMINI_MODEL_NAME
+from database import get_all_searches, get_existing_job_urls, save_jobs_to_db 
+from api_client import run_job_scrape, get_gemini_analysis_batch, create_resume_cache, GEMINI_MAX_DESCRIPTION_CHARS, ANALYSIS_PROMPT_VERSION
+
+# --- THRESHOLDS ---
+SIMILARITY_THRESHOLD = 0.45
+GEMINI_RATING_THRESHOLD = 7
+
+# Jobs that pass the similarity check are rated by Gemini in batches of this size,
+# so a search costs one round-trip per batch instead of one per job.
+GEMINI_BATCH_SIZE = 8
+
+# Titles that clearly ask for more seniority than an entry level role. Gemini's strict prompt
+# rejects these anyway, so matching them here skips the embedding and Gemini work entirely.
+SENIOR_TITLE_RE = re.compile(r'\b(senior|sr\.?|lead|principal|staff|manager|director|head of|vp)\b', re.IGNORECASE)
+
+# Maximum number of searches scraped at the same time, to stay clear of site rate limits.
+SCRAPE_CONCURRENCY = 4
+# Maximum number of Gemini analysis requests in flight at the same time.
+GEMINI_CONCURRENCY = 8
+
+# --- EMBEDDING CACHE ---
+# Resume and job description embeddings are stored on disk keyed by a hash of the model id and
+# text, so profiles and postings seen in an earlier run (or another search in this run) are never
+# re-encoded. Editing a resume changes its hash, which naturally invalidates the old entry.
+# Vectors are stored as float16, which halves the file size and moves cosine scores by under 1e-3.
+EMBEDDING_CACHE_PATH = '.embed_cache.sqlite3'
+# Keys per SELECT ... IN (...) query, well under SQLite's limit on bound parameters.
+EMBEDDING_CACHE_LOOKUP_CHUNK = 500
+# MiniLM only reads the first 256 tokens of a text, which 1500 characters comfortably covers.
+# Cutting texts down first avoids tokenizing (and hashing) the rest of long postings for nothing.
+EMBEDDING_MAX_CHARS = 1500
+_embedding_memo: dict[bytes, np.ndarray] = {}
+
+def _embedding_cache_key(text: str) -> bytes:
+    """Hashes a text together with the embedding model id, so a model change never reuses stale vectors."""
+    return hashlib.sha256(f"{config.EMBEDDING_MODEL_ID}\n{text}".encode()).digest()
+
+_embedding_cache_ready = False
+
+def _open_embedding_cache() -> sqlite3.Connection:
+    """Opens the on-disk embedding cache, creating its tables the first time in this process."""
+    global _embedding_cache_ready
+    conn = sqlite3.connect(EMBEDDING_CACHE_PATH)
+    if not _embedding_cache_ready:
+        # Idempotent, so two threads racing to run this on the first open is harmless.
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS embedding_cache (hash BLOB PRIMARY KEY, emb BLOB NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS gemini_verdicts ("
+                "key BLOB PRIMARY KEY, gemini_rating INTEGER, ai_reason TEXT, created_at REAL NOT NULL)"
+            )
+        _embedding_cache_ready = True
+    return conn
+
+def get_text_embeddings(texts: list[str]) -> np.ndarray:
+    """
+    Returns an (N, dim) array of unit-length embeddings for the given texts. Cached texts are
+    looked up in memory and on disk; only the misses are encoded, all in a single batched call.
+    Repeated texts (the same posting listed on several sites) are looked up and encoded once.
+    """
+    texts = [text[:EMBEDDING_MAX_CHARS] for text in texts]
+    keys = [_embedding_cache_key(text) for text in texts]
+    # First index of each distinct uncached text, by key.
+    missing = {}
+    for i, key in enumerate(keys):
+        if key not in _embedding_memo:
+            missing.setdefault(key, i)
+
+    if missing:
+        # The disk cache is only an optimization: if it can't be opened, read or written (unwritable
+        # directory, corrupt file, lock timeout), the error is printed and the texts are just encoded.
+        try:
+            with closing(_open_embedding_cache()) as conn:
+                missing_keys = list(missing)
+                for start in range(0, len(missing_keys), EMBEDDING_CACHE_LOOKUP_CHUNK):
+                    chunk = missing_keys[start:start + EMBEDDING_CACHE_LOOKUP_CHUNK]
+                    rows = conn.execute(
+                        f"SELECT hash, emb FROM embedding_cache WHERE hash IN ({','.join('?' * len(chunk))})", chunk
+                    ).fetchall()
+                    for key, emb in rows:
+                        _embedding_memo[key] = np.frombuffer(emb, dtype=np.float16).astype(np.float32)
+        except sqlite3.Error as e:
+            print(f"  - Embedding cache unavailable, encoding without it: {e}")
+        still_missing = [i for key, i in missing.items() if key not in _embedding_memo]
+
+        if still_missing:
+            print(f"  - Encoding {len(still_missing)} new text(s) ({len(texts) - len(still_missing)} cached or repeated).")
+            # All misses go into one call on purpose: encode() sorts its whole input by length
+            # before batching, so each batch pads only to similarly sized texts. The progress
+            # bar is off because tqdm adds per-batch overhead for output nobody reads here.
+            with config.embedding_inference_mode():
+                new_embeddings = config.sentence_model.encode(
+                    [texts[i] for i in still_missing], batch_size=64, normalize_embeddings=True, show_progress_bar=False
+                ).astype(np.float32)
+            for i, embedding in zip(still_missing, new_embeddings):
+                _embedding_memo[keys[i]] = embedding
+            try:
+                with closing(_open_embedding_cache()) as conn, conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO embedding_cache (hash, emb) VALUES (?, ?)",
+                        [(keys[i], embedding.astype(np.float16).tobytes()) for i, embedding in zip(still_missing, new_embeddings)]
+                    )
+            except sqlite3.Error as e:
+                print(f"  - Could not save new embeddings to the cache: {e}")
+
+    return np.stack([_embedding_memo[key] for key in keys])
+
+# Without SimSIMD, dot products run in a Numba kernel parallelized over the candidates, or in
+# NumPy's BLAS matmul when Numba isn't installed either.
+_batch_dot = None
+if simsimd is None:
+    try:
+        from numba import njit, prange
+    except ImportError:
+        pass
+    else:
+        @njit(parallel=True, fastmath=True, cache=True)
+        def _batch_dot(embeddings: np.ndarray, query: np.ndarray) -> np.ndarray:
+            """Dot product of every row of `embeddings` with `query`."""
+            out = np.empty(embeddings.shape[0], dtype=np.float32)
+            for i in prange(embeddings.shape[0]):
+                out[i] = (embeddings[i] * query).sum()
+            return out
+
+        # Compile now (or load the cached build), so the JIT cost isn't paid during scoring.
+        _batch_dot(np.zeros((2, 384), dtype=np.float32), np.zeros(384, dtype=np.float32))
+
+def cosine_similarities(queries: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    """
+    Returns the (len(queries), len(candidates)) matrix of cosine similarities. SimSIMD computes
+    it in one call with AVX2/AVX-512 kernels, skipping PyTorch's per-op dispatch overhead.
+    Every embedding here is unit-length (encoded with normalize_embeddings=True), so cosine
+    is a plain dot product and no norms or divisions are computed per pair.
+    """
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    candidates = np.ascontiguousarray(candidates, dtype=np.float32)
+    if simsimd is not None:
+        return np.asarray(simsimd.cdist(queries, candidates, metric='dot'))
+    if _batch_dot is not None:
+        return np.stack([_batch_dot(candidates, query) for query in queries])
+    return queries @ candidates.T
+
+# --- GEMINI VERDICT CACHE ---
+# Agencies often repost the same job under a new URL. A Gemini verdict is reused only when
+# everything Gemini saw matches: the model, the prompt version, the experience level, the resume
+# and the description exactly as it was analyzed. Verdicts expire after this many days, so the
+# table (persisted across CI runs) stays small and never serves a rating indefinitely.
+VERDICT_CACHE_MAX_AGE_DAYS = 30
+
+def _verdict_cache_key(resume_context: str, experience_level: str, description: str) -> bytes:
+    """Hashes every input of a Gemini analysis, with the description cut exactly as it is sent."""
+    return hashlib.sha256(
+        f"{GEMINI_MODEL_NAME}:v{ANALYSIS_PROMPT_VERSION}\n{experience_level}\n{resume_context}\n"
+        f"{description[:GEMINI_MAX_DESCRIPTION_CHARS]}".encode()
+    ).digest()
+
+def find_cached_verdicts(resume_context: str, experience_level: str, descriptions: list[str]) -> list[dict | None]:
+    """
+    Returns, per description, the unexpired verdict Gemini gave the identical analysis, or None.
+    If the cache can't be read, every description counts as a miss.
+    """
+    keys = [_verdict_cache_key(resume_context, experience_level, description) for description in descriptions]
+    cutoff = time.time() - VERDICT_CACHE_MAX_AGE_DAYS * 86400
+    try:
+        with closing(_open_embedding_cache()) as conn:
+            rows = conn.execute(
+                f"SELECT key, gemini_rating, ai_reason FROM gemini_verdicts WHERE created_at >= ? AND key IN ({','.join('?' * len(keys))})",
+                [cutoff, *keys]
+            ).fetchall()
+    except sqlite3.Error as e:
+        print(f"  > Gemini verdict cache unavailable, analyzing every job: {e}")
+        return [None] * len(descriptions)
+    verdicts = {key: {"gemini_rating": rating, "ai_reason": reason} for key, rating, reason in rows}
+    return [verdicts.get(key) for key in keys]
+
+def store_verdicts(resume_context: str, experience_level: str, descriptions: list[str], verdicts: list[dict | None]):
+    """
+    Remembers Gemini's verdicts so identical reposts can reuse them later, and drops expired ones.
+    A failed write is only printed, so the verdicts Gemini already returned are still used.
+    """
+    now = time.time()
+    rows = [
+        (_verdict_cache_key(resume_context, experience_level, description), verdict.get("gemini_rating"), verdict.get("ai_reason"), now)
+        for description, verdict in zip(descriptions, verdicts) if verdict
+    ]
+    try:
+        with closing(_open_embedding_cache()) as conn, conn:
+            conn.execute("DELETE FROM gemini_verdicts WHERE created_at < ?", (now - VERDICT_CACHE_MAX_AGE_DAYS * 86400,))
+            if rows:
+                conn.executemany("INSERT OR REPLACE INTO gemini_verdicts VALUES (?, ?, ?, ?)", rows)
+    except sqlite3.Error as e:
+        print(f"  > Could not save Gemini verdicts to the cache: {e}")
+
+# --- HELPER FUNCTIONS ---
+
+def build_job_row(job: dict, similarity_score: float, gemini_result: dict | None, search: dict) -> dict | None:
+    """Applies the Gemini rating threshold, returning the row to save for an accepted job or None."""
+    rating = (gemini_result or {}).get("gemini_rating")
+    if rating is None or rating < GEMINI_RATING_THRESHOLD:
+        print(f"  > Skipped. Gemini rating ({'N/A' if rating is None else rating}/10) is below threshold.")
+        return None
+
+    print(f"  > SUCCESS! Gemini rated {rating}/10. Preparing to save.")
+
+    # The row is built JSON-ready, with no per-field NaN cleanup: scraped fields had NaN replaced
+    # by None in run_job_scrape, the description was validated as a string, SimSIMD scores a
+    # zero vector as 0 rather than NaN, and the response schema types gemini_rating as an integer.
+    return {
+        "title": job.get("title"), "company": job.get("company"),
+        "job_url": job.get("job_url"), "description": job["description"],
+        "similarity_score": similarity_score,
+        "gemini_rating": rating,
+        "ai_reason": gemini_result.get("ai_reason"),
+        "profile_id": search['profiles']['id'], # Link job to the profile used
+        "search_id": search['id'] # Link job to the search used
+    }
+
+async def analyze_batch(pending: list, search: dict, experience_level: str, resume_cache, gemini_semaphore: asyncio.Semaphore) -> list[dict]:
+    """Rates a batch of (job, similarity_score) tuples with one Gemini call and returns the rows to save."""
+    resume_context = search['profiles']['resume_context']
+    descriptions = [job["description"] for job, _ in pending]
+    async with gemini_semaphore:
+        gemini_results = await get_gemini_analysis_batch(resume_context, descriptions, experience_level, resume_cache)
+    # The SQLite write runs in a worker thread so it doesn't stall the event loop while other batches are in flight.
+    await asyncio.to_thread(store_verdicts, resume_context, experience_level, descriptions, gemini_results)
+
+    jobs_to_save = []
+    for (job, similarity_score), gemini_result in zip(pending, gemini_results):
+        print(f"\nGemini result for job: {job.get('title')}...")
+        job_row = build_job_row(job, similarity_score, gemini_result, search)
+        if job_row:
+            jobs_to_save.append(job_row)
+
+    return jobs_to_save
+
+def score_jobs(jobs: list[dict], resume_embedding: np.ndarray) -> np.ndarray:
+    """
+    Scores every job of a search at once: one batched encode into an (N, dim) array and one
+    similarity op giving the (N,) array of similarity scores.
+    """
+    job_embeddings = get_text_embeddings([job["description"] for job in jobs])
+    return cosine_similarities(resume_embedding[None, :], job_embeddings)[0]
+
+def _scrape_key(search: dict) -> tuple:
+    """The search settings that decide what run_job_scrape fetches."""
+    return (
+        search['search_term'], search.get('country'),
+        search.get('experience_level', 'entry_level'), search.get('hours_old', 24)
+    )
+
+async def _scrape_bounded(search: dict, scrape_semaphore: asyncio.Semaphore) -> list:
+    """Runs the blocking JobSpy scrape in a worker thread, a few searches at a time."""
+    async with scrape_semaphore:
+        return await asyncio.to_thread(run_job_scrape, search)
+
+async def scrape_once(search: dict, scrape_tasks: dict, scrape_semaphore: asyncio.Semaphore) -> list:
+    """
+    Scrapes a search, sharing one scrape between all searches with identical settings.
+    JobSpy opens fresh (browser-fingerprinted) sessions for every call and offers no way to pass
+    in a pooled client, so skipping repeated calls is what saves the connection setup and requests.
+    """
+    key = _scrape_key(search)
+    if key in scrape_tasks:
+        print(f"\n--- Search '{search['search_name']}' reuses the scrape of an identical search. ---")
+    else:
+        scrape_tasks[key] = asyncio.create_task(_scrape_bounded(search, scrape_semaphore))
+    return await scrape_tasks[key]
+
+async def process_search(search: dict, resume_embeddings: dict, resume_caches: dict, saved_urls: set, seen_jobs: set, scrape_tasks: dict, scrape_semaphore: asyncio.Semaphore, scoring_executor: ThreadPoolExecutor, gemini_semaphore: asyncio.Semaphore):
+    """Scrapes one search, scores the jobs against its linked profile, then rates and saves the best ones."""
+    linked_profile = search['profiles']
+    experience_level = search.get('experience_level', 'entry_level')
+
+    jobs_found = await scrape_once(search, scrape_tasks, scrape_semaphore)
+
+    print(f"\n--- Scoring jobs against profile '{linked_profile['profile_name']}' for search '{search['search_name']}' ---")
+    resume_embedding = resume_embeddings[linked_profile['id']]
+
+    jobs_to_score = []
+    for job in jobs_found:
+        # Skip postings already saved, or already picked up by another search for the same profile and
+        # experience level, before any model work. Searches for other profiles or levels still judge
+        # the posting against their own resume. (There's no await in this loop, so the checks can't race.)
+        job_url = job.get('job_url')
+        if not job_url:
+            print(f"\nSkipped Job: {job.get('title')}. Job has no URL.")
+            continue
+        if job_url in saved_urls:
+            print(f"\nSkipped Job: {job.get('title')}. Already saved.")
+            continue
+
+        # This search's own rejections come before the job is marked as seen, so they never hide it from other searches.
+        if experience_level == 'entry_level' and SENIOR_TITLE_RE.search(job.get('title') or ''):
+            print(f"\nSkipped Job: {job.get('title')}. Title is too senior for an entry level search.")
+            continue
+
+        description = job.get("description")
+        if not isinstance(description, str) or not description:
+            print(f"\nSkipped Job: {job.get('title')}. Missing job description.")
+            continue
+
+        seen_key = (linked_profile['id'], experience_level, job_url)
+        if seen_key in seen_jobs:
+            print(f"\nSkipped Job: {job.get('title')}. Already seen in another search for this profile.")
+            continue
+        seen_jobs.add(seen_key)
+        jobs_to_score.append(job)
+
+    if not jobs_to_score:
+        return
+
+    # Encoding is CPU/GPU-bound, so it runs on the scoring stage's worker thread while the event
+    # loop keeps other searches' scrapes and Gemini requests moving.
+    similarity_scores = await asyncio.get_running_loop().run_in_executor(
+        scoring_executor, score_jobs, jobs_to_score, resume_embedding
+    )
+    passed_indices = np.flatnonzero(similarity_scores >= SIMILARITY_THRESHOLD)
+    print(f"\n  - {len(passed_indices)} of {len(jobs_to_score)} job(s) passed the similarity check (threshold {SIMILARITY_THRESHOLD}).")
+    if not len(passed_indices):
+        return
+
+    # Only the surviving jobs go on, as (job, similarity_score) tuples.
+    passed = []
+    for i in passed_indices:
+        job, similarity_score = jobs_to_score[i], float(similarity_scores[i])
+        print(f"\nProcessing Job: {job.get('title')}...")
+        print(f"  > Passed similarity check: {similarity_score:.2f}.")
+        passed.append((job, similarity_score))
+
+    # Reposts of descriptions already rated for this resume and level reuse the stored verdict;
+    # only the rest are queued for Gemini.
+    jobs_to_save = []
+    to_analyze = []
+    cached_verdicts = await asyncio.to_thread(
+        find_cached_verdicts, linked_profile['resume_context'], experience_level, [job["description"] for job, _ in passed]
+    )
+    for (job, similarity_score), verdict in zip(passed, cached_verdicts):
+        if verdict:
+            print(f"\nReusing Gemini verdict of an identical posting for job: {job.get('title')}...")
+            job_row = build_job_row(job, similarity_score, verdict, search)
+            if job_row:
+                jobs_to_save.append(job_row)
         else:
-            cleaned[k] = v
-    return cleaned
+            to_analyze.append((job, similarity_score))
+
+    # All batches of the search are sent at once; the shared semaphore caps in-flight Gemini requests.
+    # Results are collected in completion order, so a slow batch doesn't hold up the others' verdicts.
+    batches = [to_analyze[i:i + GEMINI_BATCH_SIZE] for i in range(0, len(to_analyze), GEMINI_BATCH_SIZE)]
+    for batch_result in asyncio.as_completed([
+        analyze_batch(batch, search, experience_level, resume_caches[linked_profile['id']], gemini_semaphore)
+        for batch in batches
+    ]):
+        jobs_to_save.extend(await batch_result)
+
+    # Everything the search accepted is saved in a single round-trip.
+    await asyncio.to_thread(save_jobs_to_db, jobs_to_save)
 
 # --- MAIN EXECUTION SCRIPT (UPGRADED LOGIC) ---
-def main():
-    """The main function to orchestrate the job search and analysis process."""
+async def main():
+    """
+    The main function to orchestrate the job search and analysis process. The server runs it
+    once per search in the same worker process, each time under a new event loop, so every
+    loop-bound object (semaphores, tasks, executors) is created here per run, never at module level.
+    """
     print("\n--- Starting Intelli-Apply Pro Job Assistant (Smarter Search Mode) ---")
     
     all_searches = get_all_searches()
@@ -37,66 +385,61 @@ def main():
     if not all_searches:
         print("\nHalting: No saved searches to run.")
         return
-    
-    # --- THRESHOLDS ---
-    SIMILARITY_THRESHOLD = 0.45
-    GEMINI_RATING_THRESHOLD = 7
-    
+
+    searches_to_run = []
     for search in all_searches:
-        # --- KEY CHANGE: Get the linked profile and experience level for each search ---
+        # Each search needs a linked profile for its resume context; skip the others before scraping.
         linked_profile = search.get('profiles')
-        experience_level = search.get('experience_level', 'entry_level')
-        
         if not linked_profile or not linked_profile.get('resume_context'):
             print(f"\n--- Skipping search: '{search['search_name']}'. No profile is linked. ---")
             continue
+        searches_to_run.append(search)
+
+    # Searches are grouped by profile, so each distinct resume is encoded once (in one batch for
+    # all profiles) and gets one Gemini context cache (None when caching wasn't possible).
+    profiles = {search['profiles']['id']: search['profiles'] for search in searches_to_run}
+    if not profiles:
+        print("\nHalting: No searches with a linked profile to run.")
+        return
+    print(f"\n--- Encoding {len(profiles)} linked profile(s) ---")
+    embeddings = get_text_embeddings([profile['resume_context'] for profile in profiles.values()])
+    resume_embeddings = dict(zip(profiles, embeddings))
+    caches = await asyncio.gather(*[
+        asyncio.to_thread(create_resume_cache, profile['resume_context']) for profile in profiles.values()
+    ])
+    resume_caches = dict(zip(profiles, caches))
+
+    # URLs of jobs already saved (job_url is unique in the table), and the
+    # (profile id, experience level, job_url) combinations already being processed in this run.
+    saved_urls = get_existing_job_urls()
+    seen_jobs = set()
+
+    # In-flight scrapes keyed by their settings, shared by searches that would fetch the same jobs.
+    scrape_tasks = {}
+    scrape_semaphore = asyncio.Semaphore(SCRAPE_CONCURRENCY)
+    gemini_semaphore = asyncio.Semaphore(GEMINI_CONCURRENCY)
+    # A single worker thread, so searches are encoded one at a time instead of competing for the cores.
+    scoring_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scoring')
+    try:
+        # Searches run concurrently as a pipeline: scraping (network), scoring (the worker thread),
+        # and Gemini analysis and saving (network) of different searches all overlap.
+        await asyncio.gather(*[
+            process_search(search, resume_embeddings, resume_caches, saved_urls, seen_jobs, scrape_tasks, scrape_semaphore, scoring_executor, gemini_semaphore)
+            for search in searches_to_run
+        ])
+    finally:
+        scoring_executor.shutdown()
+        # Caches are billed for storage until they expire, so drop them as soon as we're done.
+        # A failed delete is only printed, so the other caches are still dropped and an exception
+        # already in flight isn't masked; that cache simply lives until its TTL.
+        for cache in resume_caches.values():
+            if cache:
+                try:
+                    cache.delete()
+                except Exception as e:
+                    print(f"  > Could not delete Gemini context cache {cache.name}: {e}")
 
-        resume_context = linked_profile['resume_context']
-        print(f"\n--- Encoding profile '{linked_profile['profile_name']}' for search '{search['search_name']}' ---")
-        resume_embedding = sentence_model.encode(resume_context, convert_to_tensor=True)
-        
-        jobs_found = run_job_scrape(search)
-        for job in jobs_found:
-            print(f"\nProcessing Job: {job.get('title')}...")
-            
-            description = job.get("description")
-            if not isinstance(description, str) or pd.isna(description):
-                print("  > Skipped. Missing job description.")
-                continue
-
-            similarity_score = get_similarity_score(resume_embedding, description)
-
-            if similarity_score < SIMILARITY_THRESHOLD:
-                print(f"  > Skipped. Similarity score ({similarity_score:.2f}) is below threshold.")
-                continue
-            
-            print(f"  > Passed similarity check: {similarity_score:.2f}.")
-            
-            # --- KEY CHANGE: Pass the experience level to the AI analyst ---
-            gemini_result = get_gemini_analysis(resume_context, description, experience_level)
-            
-            if not gemini_result or gemini_result.get("gemini_rating", 0) < GEMINI_RATING_THRESHOLD:
-                rating = gemini_result.get('gemini_rating', 'N/A') if gemini_result else 'N/A'
-                print(f"  > Skipped. Gemini rating ({rating}/10) is below threshold.")
-                continue
-
-            print(f"  > SUCCESS! Gemini rated {gemini_result['gemini_rating']}/10. Preparing to save.")
-            
-            job_to_save = {
-                "title": job.get("title"), "company": job.get("company"),
-                "job_url": job.get("job_url"), "description": description,
-                "similarity_score": similarity_score,
-                "gemini_rating": gemini_result.get("gemini_rating"),
-                "ai_reason": gemini_result.get("ai_reason"),
-                "created_at": datetime.now().isoformat(),
-                "profile_id": linked_profile['id'], # Link job to the profile used
-                "search_id": search['id'] # Link job to the search used
-            }
-            
-            cleaned_job_to_save = clean_job_data(job_to_save)
-            save_job_to_db(cleaned_job_to_save)
-            
     print("\n--- Job search process finished. ---")
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
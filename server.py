@@ -1,6 +1,11 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
+import asyncio
 import threading
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from waitress import serve
 
 # Import the main function from your existing script
 from run_job_search import main as run_job_search_script
@@ -15,39 +20,92 @@ origins = ["http://localhost:5173", "http://localhost:5174"]
 CORS(app, resources={r"/run-search": {"origins": origins}})
 
 
-# A simple variable to prevent multiple searches from running at once
-is_search_running = False
+# Held while a search runs, to prevent multiple searches from running at once. Taking it with
+# acquire(blocking=False) is an atomic test-and-set, so two simultaneous requests can't both start one.
+search_lock = threading.Lock()
 
-def run_script_in_thread():
-    """Wrapper function to run the script and handle the lock."""
-    global is_search_running
+# Searches run in a separate worker process, so the CPU-heavy embedding work never competes
+# with request handling for the GIL. The worker is kept between searches, so the sentence model
+# (warmed up in it when the server starts) stays loaded for every search after that.
+# Each search gets a fresh event loop from asyncio.run(), so nothing that outlives main() may be
+# tied to a loop: main() creates its semaphores and tasks per call, and Gemini is called through
+# the blocking client in threads (the SDK's async client stays bound to the first loop it ran on).
+search_executor = ProcessPoolExecutor(max_workers=1)
+# Serializes replacing a crashed pool, since done callbacks run on the executors' own threads.
+search_executor_lock = threading.Lock()
+
+def replace_broken_worker(broken_executor: ProcessPoolExecutor, warm_up: bool):
+    """
+    Swaps in a new worker pool after the worker process died (e.g. ran out of memory), since a
+    broken pool can't take new searches. Does nothing if the pool was already replaced.
+    """
+    global search_executor
+    with search_executor_lock:
+        if search_executor is not broken_executor:
+            return
+        print("--- Flask Server: The search worker process crashed. Starting a new one. ---")
+        search_executor = ProcessPoolExecutor(max_workers=1)
+    if warm_up:
+        start_search_worker()
+
+def warm_up_search_worker():
+    """Loads the sentence model in the worker process and runs one throwaway encode."""
+    import config
+    config.sentence_model.encode("warmup", show_progress_bar=False)
+    print("--- Flask Server: Search worker is warmed up. ---")
+
+def on_warm_up_finished(executor: ProcessPoolExecutor, future):
+    """Replaces the pool if the worker died while warming up, so later searches don't fail to submit."""
+    error = future.exception()
+    if isinstance(error, BrokenProcessPool):
+        # Not warmed up again, or a worker that can't load the model would crash in a loop;
+        # the next search loads the model itself.
+        replace_broken_worker(executor, warm_up=False)
+    elif error:
+        print(f"--- Flask Server: Warming up the search worker failed: {error} ---")
+
+def start_search_worker():
+    """Starts the worker process by warming it up; a search submitted meanwhile simply queues behind this."""
+    executor = search_executor
+    executor.submit(warm_up_search_worker).add_done_callback(partial(on_warm_up_finished, executor))
+
+def run_script_in_process():
+    """Runs the job search script inside the worker process."""
     try:
-        print("--- Flask Server: Starting job search script in a new thread. ---")
-        run_job_search_script()
+        print("--- Flask Server: Starting job search script in the worker process. ---")
+        asyncio.run(run_job_search_script())
     except Exception as e:
         print(f"--- Flask Server: An error occurred in the job search script: {e} ---")
-    finally:
-        # Once the script is done, allow a new one to start
-        is_search_running = False
-        print("--- Flask Server: Job search script finished. Ready for new requests. ---")
+
+def on_search_finished(executor: ProcessPoolExecutor, future):
+    """Called in the server process once the worker is done; allows a new search to start."""
+    if isinstance(future.exception(), BrokenProcessPool):
+        replace_broken_worker(executor, warm_up=True)
+    search_lock.release()
+    print("--- Flask Server: Job search script finished. Ready for new requests. ---")
 
 
 @app.route('/run-search', methods=['POST'])
 def trigger_search():
     """This is the endpoint your frontend will call."""
-    global is_search_running
-    if is_search_running:
+    if not search_lock.acquire(blocking=False):
         # If a search is already running, return a conflict error
         return jsonify({"message": "A job search is already in progress."}), 409
 
     # If no search is running, start a new one
-    is_search_running = True
-    # We run the script in a separate thread so it doesn't block the server
-    thread = threading.Thread(target=run_script_in_thread)
-    thread.start()
+    # We run the script in the worker process so it doesn't block the server
+    executor = search_executor
+    try:
+        future = executor.submit(run_script_in_process)
+    except Exception:
+        search_lock.release()
+        raise
+    future.add_done_callback(partial(on_search_finished, executor))
     
     return jsonify({"message": "Successfully triggered the local job search script."}), 202
 
 if __name__ == '__main__':
-    # Run the Flask server on port 5001
-    app.run(port=5001, debug=True)
+    # Only here, not at import: on Windows the worker process re-imports this module.
+    start_search_worker()
+    # Serve the app on port 5001 with waitress, a production WSGI server that also runs on Windows
+    serve(app, host='127.0.0.1', port=5001)